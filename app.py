@@ -1,29 +1,37 @@
 import asyncio
+import gzip
+import hashlib
+import logging
 import os
 import re
-import time
-import yaml
 import shutil
 import subprocess
+import time
 from typing import Any, Dict, Optional, List, Tuple
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, Response
 from fastapi.staticfiles import StaticFiles
 
-import psutil
-from web3 import Web3
+# web3, psutil, yaml and python-telegram-bot are imported where first used
 
 from cypher_rpc import CypherRPC
-from storage import load_json, add_watch_address, remove_watch_address
+from storage import load_json, save_json, add_watch_address, remove_watch_address
 from telegram_notify import TelegramNotifier
-from watchers import wallet_watch_loop, pm2_log_watch_loop
-from llm import OllamaLLM
-from peer_geo import peer_geo_loop
+from llm import OllamaEmbedder, OllamaLLM
+from nodes import Node, NodeManager
+from leader import LeaderLock
+
+# module imports done; the process start itself comes from _process_start_ts()
+_IMPORT_TS = time.time()
+
+log = logging.getLogger("uvicorn.error")
 
 CONFIG_PATH = "config.yaml"
 WATCHLIST_PATH = "watchlist.json"
 STATE_PATH = "state.json"
+LEADER_LOCK_PATH = ".leader.lock"
+SNAPSHOT_PATH = "status_snapshot.json"
 
 # ====== file read policy ======
 CYPHER_REPO_BASE = "/root/go/src/github.com/cypherium/cypher"
@@ -45,6 +53,12 @@ _FILE_CACHE: Dict[str, Any] = {
 }
 CACHE_TTL_SEC = 60.0
 
+# embedding index over CYPHER_REPO_BASE, built lazily (numpy is imported then)
+_RAG: Dict[str, Any] = {
+    "tried": False,
+    "index": None,
+}
+
 TX_HASH_RE = re.compile(r"^0x[a-fA-F0-9]{64}$")
 ADDR_RE = re.compile(r"^0x[a-fA-F0-9]{40}$")
 
@@ -52,10 +66,74 @@ app = FastAPI()
 app.mount("/static", StaticFiles(directory="web"), name="web")
 
 _cfg: Dict[str, Any] = {}
-_rpc: Optional[CypherRPC] = None
+_nodes: Optional[NodeManager] = None
 _notifier: Optional[TelegramNotifier] = None
 _llm: Optional[OllamaLLM] = None
-_peer_geo_path: str = "peer_geo.json"
+_leader: Optional[LeaderLock] = None
+_background: List["asyncio.Task[Any]"] = []
+
+# path -> (mtime, body, gzipped body, etag)
+_PAGE_CACHE: Dict[str, Tuple[float, bytes, bytes, str]] = {}
+
+_boot: Dict[str, Optional[float]] = {
+    "import": _IMPORT_TS,
+    "startup_done": None,
+    "first_request": None,
+}
+
+
+def _process_start_ts() -> float:
+    """Process start from /proc (clock-tick resolution); import time elsewhere."""
+    try:
+        with open("/proc/self/stat", "r") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime", "r") as f:
+            uptime = float(f.read().split()[0])
+        # starttime is in ticks since boot; btime in /proc/stat is whole seconds
+        elapsed = uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+        return time.time() - elapsed
+    except Exception:
+        return _IMPORT_TS
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() not in ("gzip", "*"):
+            continue
+        q = 1.0
+        for p in params.split(";"):
+            k, _, v = p.strip().partition("=")
+            if k.strip().lower() == "q":
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        return q > 0
+    return False
+
+
+def _page(path: str, request: Request) -> Response:
+    st = os.stat(path)
+    cached = _PAGE_CACHE.get(path)
+    if cached is None or cached[0] != st.st_mtime:
+        with open(path, "rb") as f:
+            body = f.read()
+        cached = (st.st_mtime, body, gzip.compress(body, 9), '"' + hashlib.sha1(body).hexdigest() + '"')
+        _PAGE_CACHE[path] = cached
+    _, body, gz, etag = cached
+
+    headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if _accepts_gzip(request.headers.get("accept-encoding", "")):
+        # distinct strong validator per representation
+        etag = etag[:-1] + '-gz"'
+        headers["Content-Encoding"] = "gzip"
+        body = gz
+    headers["ETag"] = etag
+    if etag in (t.strip() for t in request.headers.get("if-none-match", "").split(",")):
+        headers.pop("Content-Encoding", None)
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="text/html; charset=utf-8", headers=headers)
 
 
 # ====== New: make tool result JSON-serializable ======
@@ -153,7 +231,56 @@ def _scan_repo_files() -> List[Tuple[str, float, str]]:
     return items
 
 
-def _get_repo_context() -> Dict[str, Any]:
+def _get_rag() -> Optional[Any]:
+    if _RAG["tried"]:
+        return _RAG["index"]
+    _RAG["tried"] = True
+
+    rc = _cfg.get("rag", {})
+    if not rc.get("enabled", False):
+        return None
+    try:
+        from rag import DEFAULT_EXTS, RepoIndex
+    except ImportError:
+        return None  # numpy missing: keep the raw preview context
+
+    ai = _cfg["ai"]
+    embedder = OllamaEmbedder(ai["ollama_base_url"], rc.get("embed_model", "nomic-embed-text"))
+    _RAG["index"] = RepoIndex(
+        base=CYPHER_REPO_BASE,
+        index_dir=rc.get("index_dir", "rag_index"),
+        embed=embedder.embed,
+        is_denied=_is_denied,
+        model=embedder.model,
+        exts=rc.get("exts", DEFAULT_EXTS),
+        chunk_chars=int(rc.get("chunk_chars", 1200)),
+        batch_size=int(rc.get("batch_size", 32)),
+    )
+    return _RAG["index"]
+
+
+async def _rag_index_loop() -> None:
+    index = _get_rag()
+    if index is None:
+        return
+    interval = float(_cfg.get("rag", {}).get("refresh_interval_sec", 600))
+    while True:
+        try:
+            await asyncio.to_thread(index.refresh)
+        except Exception:
+            pass  # Ollama down etc.; retry next round
+        await asyncio.sleep(interval)
+
+
+def _get_repo_context(question: str) -> Dict[str, Any]:
+    index = _get_rag()
+    if index is not None and index.ready():
+        try:
+            k = int(_cfg.get("rag", {}).get("top_k", 4))
+            return {"chunks": index.search(question, k=k)}
+        except Exception:
+            pass
+
     now = time.time()
     if (now - float(_FILE_CACHE["ts"])) < CACHE_TTL_SEC and _FILE_CACHE["items"]:
         items = _FILE_CACHE["items"]
@@ -184,36 +311,197 @@ def _get_gpu_percent() -> Optional[float]:
 
 
 def _get_cpu_percent() -> float:
+    import psutil
+
     return float(psutil.cpu_percent(interval=None))
 
 
-async def _tool_status() -> Dict[str, Any]:
-    assert _rpc is not None
-    if not _rpc.is_connected():
+def _node(name: Optional[str] = None) -> Node:
+    assert _nodes is not None
+    node = _nodes.get(name)
+    if node is None:
+        raise HTTPException(404, f"unknown node: {name}")
+    return node
+
+
+def _node_status(rpc: CypherRPC) -> Dict[str, Any]:
+    if not rpc.is_connected():
         return {"connected": False}
 
     return {
         "connected": True,
-        "block_number": _rpc.block_number(),
-        "peer_count": _rpc.peer_count(),
-        "syncing": _rpc.syncing(),
-        "txpool": _rpc.txpool_status(),
-        "mining_status": _rpc.miner_status(),
-        "hashrate": _rpc.hashrate(),
+        "block_number": rpc.block_number(),
+        "peer_count": rpc.peer_count(),
+        "syncing": rpc.syncing(),
+        "txpool": rpc.txpool_status(),
+        "mining_status": rpc.miner_status(),
+        "hashrate": rpc.hashrate(),
+    }
+
+
+def _safe_status(node: Node) -> Dict[str, Any]:
+    try:
+        return _node_status(node.rpc)
+    except Exception as e:
+        return {"connected": False, "error": str(e)}
+
+
+async def _collect_statuses() -> Dict[str, Dict[str, Any]]:
+    assert _nodes is not None
+    nodes = list(_nodes.nodes.values())
+    # threads so one slow remote node does not serialize the others
+    results = await asyncio.gather(*(asyncio.to_thread(_safe_status, n) for n in nodes))
+    return {n.name: r for n, r in zip(nodes, results)}
+
+
+def _is_leader() -> bool:
+    return _leader is not None and _leader.is_leader
+
+
+def _load_snapshot(key: str = "status", want: bool = True) -> Optional[Dict[str, Dict[str, Any]]]:
+    """
+    Per-node `key` ("status" or "chain_stats") published by the leader worker,
+    if fresh enough. Touching the `.want` file asks the leader to keep
+    publishing; with a single worker nobody asks and no snapshot is taken.
+    """
+    cl = _cfg.get("cluster", {})
+    path = cl.get("snapshot_path", SNAPSHOT_PATH)
+    if want:
+        try:
+            with open(path + ".want", "a"):
+                os.utime(path + ".want")
+        except OSError:
+            pass
+    try:
+        snap = load_json(path, None)
+    except Exception:
+        return None  # mid-replace or corrupt; fall back to live
+    if not snap or (time.time() - float(snap.get("updated_at", 0))) > float(cl.get("snapshot_max_age_sec", 10)):
+        return None
+    _note_heads(snap.get("status") or {})
+    return snap.get(key)
+
+
+def _note_heads(statuses: Dict[str, Dict[str, Any]]) -> None:
+    # followers run no watcher: the leader's snapshot is how their tx caches
+    # learn the head for the reorg-depth check
+    assert _nodes is not None
+    for name, st in statuses.items():
+        node = _nodes.nodes.get(name)
+        bn = st.get("block_number")
+        if node is not None and isinstance(bn, int):
+            node.rpc.cache.note_head(bn)
+
+
+async def _tool_status(node: Node) -> Dict[str, Any]:
+    if _is_leader():
+        return _node_status(node.rpc)
+    snap = _load_snapshot()
+    if snap and node.name in snap:
+        return snap[node.name]
+    return _node_status(node.rpc)
+
+
+def _aggregate(statuses: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    assert _nodes is not None
+    nodes = [n for n in _nodes.nodes.values() if n.name in statuses]
+    per_node = {n.name: {**n.describe(), **statuses[n.name]} for n in nodes}
+
+    chains: Dict[str, Dict[str, Any]] = {}
+    for n in nodes:
+        r = statuses[n.name]
+        c = chains.setdefault(n.chain, {"nodes": 0, "connected": 0, "head": None, "lagging": []})
+        c["nodes"] += 1
+        if r.get("connected"):
+            c["connected"] += 1
+            bn = r.get("block_number")
+            if bn is not None and (c["head"] is None or bn > c["head"]):
+                c["head"] = bn
+    for n in nodes:
+        r = statuses[n.name]
+        head = chains[n.chain]["head"]
+        bn = r.get("block_number")
+        if r.get("connected") and head is not None and bn is not None and bn < head:
+            chains[n.chain]["lagging"].append({"node": n.name, "behind": head - bn})
+
+    return {
+        "total": len(nodes),
+        "connected": sum(1 for n in nodes if statuses[n.name].get("connected")),
+        "chains": chains,
+        "nodes": per_node,
     }
 
 
-def _tool_tx(txhash: str) -> Dict[str, Any]:
-    assert _rpc is not None
-    tx = _rpc.get_tx(txhash)
-    h = tx.get("hash")
-    if hasattr(h, "hex"):
-        tx["hash"] = h.hex() if str(h.hex()).startswith("0x") else "0x" + h.hex()
+async def _fleet_status() -> Dict[str, Any]:
+    statuses = None if _is_leader() else _load_snapshot()
+    if statuses is None:
+        statuses = await _collect_statuses()
+    return _aggregate(statuses)
+
+
+async def _status_snapshot_loop() -> None:
+    """Publishes status for follower workers, only while one has asked recently."""
+    cl = _cfg.get("cluster", {})
+    path = cl.get("snapshot_path", SNAPSHOT_PATH)
+    interval = float(cl.get("snapshot_interval_sec", 2))
+    max_age = float(cl.get("snapshot_max_age_sec", 10))
+    failing = False
+    while True:
+        try:
+            try:
+                wanted = (time.time() - os.stat(path + ".want").st_mtime) <= max_age
+            except OSError:
+                wanted = False
+            if not wanted:
+                await asyncio.sleep(interval)
+                continue
+
+            statuses = await _collect_statuses()
+            assert _nodes is not None
+            stats = {n.name: n.stats.snapshot() for n in _nodes.nodes.values() if n.stats is not None}
+            save_json(path, {
+                "updated_at": time.time(),
+                "status": _to_jsonable(statuses),
+                "chain_stats": stats,
+            })
+            failing = False
+        except Exception as e:
+            if not failing and _notifier is not None:
+                await _notifier.send(f"⚠️ status_snapshot_loop error: {e}")
+            failing = True
+        await asyncio.sleep(interval)
+
+
+async def _start_background() -> None:
+    """Deferred so the first requests are served before any IPC warm-up."""
+    assert _nodes is not None
+    st = _cfg.get("startup", {})
+    await asyncio.sleep(float(st.get("warmup_delay_sec", 1.0)))
+    _background.append(asyncio.create_task(_status_snapshot_loop()))
+    await _nodes.start(WATCHLIST_PATH, stagger_sec=float(st.get("stagger_sec", 0.5)))
+    _background.append(asyncio.create_task(_rag_index_loop()))
+
+
+async def _leadership_loop() -> None:
+    """Only the worker holding the leader lock runs the background loops."""
+    assert _leader is not None
+    retry = float(_cfg.get("cluster", {}).get("leader_retry_sec", 5))
+    while not _leader.try_acquire():
+        await asyncio.sleep(retry)
+    await _start_background()
+
+
+def _tool_tx(rpc: CypherRPC, txhash: str) -> Dict[str, Any]:
+    if not _is_leader() and _load_snapshot(want=False) is None:
+        rpc.block_number()  # no fresh head from the leader: ask the node
+    # lean-decoded and possibly cached: already JSON-ready, do not mutate
+    tx = rpc.get_tx(txhash)
     return {"type": "tx", "tx": tx}
 
 
-def _tool_address(addr: str) -> Dict[str, Any]:
-    assert _rpc is not None
+def _tool_address(rpc: CypherRPC, addr: str) -> Dict[str, Any]:
+    from web3 import Web3
+
     try:
         checksum_addr = Web3.to_checksum_address(addr)
     except Exception as e:
@@ -223,7 +511,7 @@ def _tool_address(addr: str) -> Dict[str, Any]:
             "address": addr,
         }
 
-    bal = _rpc.get_balance_cph(checksum_addr)
+    bal = rpc.get_balance_cph(checksum_addr)
     return {
         "type": "address",
         "address": checksum_addr,
@@ -249,12 +537,12 @@ def _route(q: str) -> Dict[str, Any]:
 
 @app.on_event("startup")
 async def startup():
-    global _cfg, _rpc, _notifier, _llm, _peer_geo_path
+    global _cfg, _nodes, _notifier, _llm, _leader
+    import yaml
+
     with open(CONFIG_PATH, "r", encoding="utf-8") as f:
         _cfg = yaml.safe_load(f)
 
-    _rpc = CypherRPC(_cfg["cypher"]["ipc_path"])
-
     tg = _cfg["telegram"]
     _notifier = TelegramNotifier(
         bot_token=tg["bot_token"],
@@ -270,22 +558,58 @@ async def startup():
             system_prompt=ai["system_prompt"],
         )
 
-    asyncio.create_task(wallet_watch_loop(_cfg, _rpc, _notifier, WATCHLIST_PATH, STATE_PATH))
-    asyncio.create_task(pm2_log_watch_loop(_cfg, _notifier))
-    _peer_geo_path = _cfg.get("peer_geo", {}).get("output_path", "peer_geo.json")
-    asyncio.create_task(peer_geo_loop(_cfg, _rpc))
+    _nodes = NodeManager(_cfg, _notifier, STATE_PATH)
+    _leader = LeaderLock(_cfg.get("cluster", {}).get("lock_path", LEADER_LOCK_PATH))
+    _background.append(asyncio.create_task(_leadership_loop()))
+    _boot["startup_done"] = time.time()
+
+
+@app.middleware("http")
+async def _first_request_timer(request: Request, call_next):
+    response = await call_next(request)
+    if _boot["first_request"] is None:
+        _boot["first_request"] = time.time()
+        start = _process_start_ts()
+        log.info("first request served %.3fs after process start", _boot["first_request"] - start)
+    return response
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    for t in _background:
+        t.cancel()
+    await asyncio.gather(*_background, return_exceptions=True)
+    _background.clear()
+    if _nodes is not None:
+        await _nodes.stop()
+    if _leader is not None:
+        _leader.release()
 
 
 @app.get("/", response_class=HTMLResponse)
-async def index():
-    with open("web/index.html", "r", encoding="utf-8") as f:
-        return f.read()
+async def index(request: Request):
+    return _page("web/index.html", request)
 
 
 @app.get("/mining-power", response_class=HTMLResponse)
-async def mining_power():
-    with open("web/mining.html", "r", encoding="utf-8") as f:
-        return f.read()
+async def mining_power(request: Request):
+    return _page("web/mining.html", request)
+
+
+@app.get("/api/boot")
+async def boot():
+    start = _process_start_ts()
+
+    def since(key: str) -> Optional[float]:
+        ts = _boot[key]
+        return None if ts is None else round(ts - start, 3)
+
+    return {
+        "process_start": start,
+        "import_sec": since("import"),
+        "startup_done_sec": since("startup_done"),
+        "first_request_sec": since("first_request"),
+    }
 
 
 @app.get("/api/watchlist")
@@ -311,15 +635,40 @@ async def watch_del(payload: Dict[str, Any]):
     return {"addresses": addrs}
 
 
+@app.get("/api/nodes")
+async def list_nodes():
+    assert _nodes is not None
+    return {"nodes": [n.describe() for n in _nodes.nodes.values()]}
+
+
 @app.get("/api/status")
-async def status():
-    return _to_jsonable(await _tool_status())
+async def status(node: Optional[str] = None):
+    return _to_jsonable(await _tool_status(_node(node)))
+
+
+@app.get("/api/status/all")
+async def status_all():
+    return _to_jsonable(await _fleet_status())
+
+
+@app.get("/api/chain/stats")
+async def chain_stats(node: Optional[str] = None):
+    n = _node(node)
+    if n.stats is None:
+        raise HTTPException(404, f"chain stats disabled for node: {n.name}")
+    # the series live in the leader process; other workers read its snapshot
+    if _is_leader():
+        return {"node": n.name, **n.stats.snapshot()}
+    snap = _load_snapshot("chain_stats")
+    if not snap or n.name not in snap:
+        raise HTTPException(503, "chain stats not available yet")
+    return {"node": n.name, **snap[n.name]}
 
 
 @app.get("/api/peer-geo")
-async def peer_geo():
+async def peer_geo(node: Optional[str] = None):
     return load_json(
-        _peer_geo_path,
+        _node(node).peer_geo_path,
         {"updated_at": None, "ip_count": 0, "peers": [], "provider": "ip-api.com/batch"},
     )
 
@@ -346,7 +695,8 @@ async def ask(payload: Dict[str, Any]):
     if not isinstance(q, str) or not q.strip():
         raise HTTPException(400, "empty question")
 
-    assert _rpc is not None
+    node = _node(payload.get("node"))
+    rpc = node.rpc
 
     r = _route(q)
     route = r["route"]
@@ -355,18 +705,20 @@ async def ask(payload: Dict[str, Any]):
     tool: Dict[str, Any] = {"route": route}
 
     if route == "tx":
-        tool["result"] = _tool_tx(arg)
+        tool["result"] = _tool_tx(rpc, arg)
     elif route == "address":
-        tool["result"] = _tool_address(arg)
+        tool["result"] = _tool_address(rpc, arg)
     elif route == "status":
-        tool["result"] = await _tool_status()
-        tool["repo"] = _get_repo_context()
+        tool["result"] = await _tool_status(node)
+        tool["repo"] = _get_repo_context(q)
     else:
-        tool["status"] = await _tool_status()
-        tool["repo"] = _get_repo_context()
+        tool["status"] = await _tool_status(node)
+        tool["repo"] = _get_repo_context(q)
         tool["question"] = arg
 
-    tool_jsonable = _to_jsonable(tool)
+    # tx/address results are lean-decoded plain data already; only status
+    # (web3 AttributeDicts from txpool/syncing) needs the extra walk
+    tool_jsonable = tool if route in ("tx", "address") else _to_jsonable(tool)
 
     if _llm is None:
         return {"answer": "AI is disabled. Returning tool output.", "tool": tool_jsonable}
@@ -0,0 +1,208 @@
+import asyncio
+import time
+from array import array
+from typing import Any, Dict, List, Optional
+
+from cypher_rpc import CypherRPC
+from telegram_notify import TelegramNotifier
+
+
+class _Ring:
+    """Fixed-capacity ring of parallel typed arrays (one per column)."""
+
+    def __init__(self, capacity: int, **columns: str):
+        self.capacity = max(2, int(capacity))
+        self.cols = {name: array(code, [0] * self.capacity) for name, code in columns.items()}
+        self.start = 0
+        self.size = 0
+
+    def append(self, **values: Any) -> None:
+        i = (self.start + self.size) % self.capacity
+        if self.size == self.capacity:
+            self.start = (self.start + 1) % self.capacity
+        else:
+            self.size += 1
+        for name, v in values.items():
+            self.cols[name][i] = v
+
+    def pop(self) -> None:
+        if self.size:
+            self.size -= 1
+
+    def get(self, name: str, k: int) -> Any:
+        """k-th oldest entry; negative k counts from the newest."""
+        if k < 0:
+            k += self.size
+        return self.cols[name][(self.start + k) % self.capacity]
+
+    def column(self, name: str) -> List[Any]:
+        return [self.get(name, k) for k in range(self.size)]
+
+
+def _percentile(sorted_vals: List[float], p: float) -> Optional[float]:
+    if not sorted_vals:
+        return None
+    i = min(len(sorted_vals) - 1, max(0, int(round(p / 100.0 * (len(sorted_vals) - 1)))))
+    return sorted_vals[i]
+
+
+def _get(obj: Any, key: str) -> Any:
+    try:
+        return obj[key]
+    except Exception:
+        return getattr(obj, key, None)
+
+
+class ChainStats:
+    """
+    Rolling block-production and sync-progress series for one node.
+
+    Fed incrementally: `record_block` by the watcher for each block it already
+    fetched, `record_head` on every poll and `record_sync` from eth_syncing, so
+    no blocks are fetched just for statistics.
+    """
+
+    def __init__(
+        self,
+        history_blocks: int = 1024,
+        head_samples: int = 512,
+        rate_window_sec: float = 60.0,
+        stall_after_sec: float = 120.0,
+    ):
+        self.blocks = _Ring(history_blocks, number="q", ts="q", txs="l", gas="q")
+        self.heads = _Ring(head_samples, t="d", head="q")
+        self.rate_window_sec = rate_window_sec
+        self.stall_after_sec = stall_after_sec
+        self.last_head_change: Optional[float] = None
+        self.sync: Optional[Dict[str, int]] = None
+
+    def record_block(self, b: Dict[str, Any]) -> None:
+        n = int(b.get("number", 0))
+        # must stay contiguous; a gap (catch-up skip) restarts the series
+        if self.blocks.size and self.blocks.get("number", -1) != n - 1:
+            self.blocks = _Ring(self.blocks.capacity, number="q", ts="q", txs="l", gas="q")
+        self.blocks.append(
+            number=n,
+            ts=int(b.get("timestamp", 0)),
+            txs=len(b.get("transactions") or []),
+            gas=int(b.get("gasUsed", 0)),
+        )
+
+    def rewind(self, n: int) -> None:
+        """Drops blocks >= n after a reorg."""
+        while self.blocks.size and self.blocks.get("number", -1) >= n:
+            self.blocks.pop()
+
+    def record_head(self, head: int, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        if not self.heads.size or self.heads.get("head", -1) != head:
+            self.last_head_change = now
+        self.heads.append(t=now, head=head)
+
+    def record_sync(self, syncing: Any) -> None:
+        if not syncing:
+            self.sync = None
+            return
+        cur, high = _get(syncing, "currentBlock"), _get(syncing, "highestBlock")
+        if cur is None or high is None:
+            self.sync = None
+            return
+        self.sync = {"current": int(cur), "highest": int(high)}
+
+    def stalled(self, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        return self.last_head_change is not None and (now - self.last_head_change) > self.stall_after_sec
+
+    def _head_rate(self, now: float) -> Optional[float]:
+        h = self.heads
+        if h.size < 2:
+            return None
+        k = h.size - 1
+        while k > 0 and now - h.get("t", k - 1) <= self.rate_window_sec:
+            k -= 1
+        dt = h.get("t", -1) - h.get("t", k)
+        if dt <= 0:
+            return None
+        return (h.get("head", -1) - h.get("head", k)) / dt
+
+    def snapshot(self, now: Optional[float] = None) -> Dict[str, Any]:
+        now = time.time() if now is None else now
+        b = self.blocks
+        ts = b.column("ts")
+        intervals = sorted(float(ts[i] - ts[i - 1]) for i in range(1, len(ts)))
+        span = float(ts[-1] - ts[0]) if len(ts) > 1 else 0.0
+        txs = sum(b.column("txs"))
+        gas = sum(b.column("gas"))
+
+        rate = self._head_rate(now)
+        head = self.heads.get("head", -1) if self.heads.size else None
+        sync: Optional[Dict[str, Any]] = None
+        if self.sync is not None:
+            remaining = max(0, self.sync["highest"] - self.sync["current"])
+            sync = {
+                **self.sync,
+                "remaining": remaining,
+                "progress": (self.sync["current"] / self.sync["highest"]) if self.sync["highest"] else None,
+                "eta_sec": (remaining / rate) if rate else None,
+            }
+
+        return {
+            "head": head,
+            "blocks_per_sec": rate,
+            "seconds_since_head_change": (now - self.last_head_change) if self.last_head_change else None,
+            "stalled": self.stalled(now),
+            "syncing": sync,
+            "window": {
+                "blocks": b.size,
+                "first": b.get("number", 0) if b.size else None,
+                "last": b.get("number", -1) if b.size else None,
+                "block_time": {
+                    "mean": (span / len(intervals)) if intervals else None,
+                    "p50": _percentile(intervals, 50),
+                    "p90": _percentile(intervals, 90),
+                    "p99": _percentile(intervals, 99),
+                    "max": intervals[-1] if intervals else None,
+                },
+                "tx_per_block": (txs / b.size) if b.size else None,
+                "tps": (txs / span) if span else None,
+                "gas_per_block": (gas / b.size) if b.size else None,
+            },
+        }
+
+
+async def chain_stats_loop(
+    cfg: Dict[str, Any],
+    rpc: CypherRPC,
+    stats: ChainStats,
+    notifier: TelegramNotifier,
+    alerts: bool = True,
+):
+    """
+    Samples eth_syncing and raises stall / recovery alerts. With
+    `alerts=False` (nodes that do not own their chain's alerts) it only samples.
+    """
+    settings = cfg.get("chain_stats", {})
+    interval = float(settings.get("sync_sample_sec", 10))
+    notify_stall = alerts and bool(settings.get("notify_stall", True))
+    alerted = False
+
+    while True:
+        try:
+            if rpc.is_connected():
+                stats.record_sync(rpc.syncing())
+
+            if stats.stalled() and not alerted:
+                alerted = True
+                if notify_stall:
+                    since = time.time() - float(stats.last_head_change or 0)
+                    await notifier.send(
+                        f"🧱 Chain stalled: no new block for {since:.0f}s (head #{stats.heads.get('head', -1)})"
+                    )
+            elif alerted and not stats.stalled():
+                alerted = False
+                if notify_stall:
+                    await notifier.send(f"✅ Blocks resumed (head #{stats.heads.get('head', -1)})")
+        except Exception:
+            pass
+
+        await asyncio.sleep(interval)
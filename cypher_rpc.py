@@ -1,35 +1,205 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
-from web3 import Web3
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Optional
 
-try:
-    from web3.providers.ipc import IPCProvider  # type: ignore
-except Exception:  # pragma: no cover
-    IPCProvider = None  # type: ignore
+if TYPE_CHECKING:  # web3 is imported on first use, it is slow to import
+    from web3 import Web3
+
+
+# hex QUANTITY fields decoded to int by the lean path; everything else stays as
+# the node sent it (hex DATA strings are already JSON-ready).
+_BLOCK_INT_FIELDS = frozenset({
+    "number", "timestamp", "gasUsed", "gasLimit", "size",
+    "difficulty", "totalDifficulty", "baseFeePerGas",
+})
+_TX_INT_FIELDS = frozenset({
+    "blockNumber", "gas", "gasPrice", "nonce", "transactionIndex", "value",
+    "type", "chainId", "v", "maxFeePerGas", "maxPriorityFeePerGas",
+})
+
+
+def _decode(raw: Dict[str, Any], int_fields: Iterable[str]) -> Dict[str, Any]:
+    return {
+        k: int(v, 16) if k in int_fields and isinstance(v, str) else v
+        for k, v in raw.items()
+    }
+
+
+def _decode_tx(raw: Dict[str, Any]) -> Dict[str, Any]:
+    return _decode(raw, _TX_INT_FIELDS)
+
+
+def _decode_block(raw: Dict[str, Any]) -> Dict[str, Any]:
+    b = _decode(raw, _BLOCK_INT_FIELDS)
+    txs = b.get("transactions")
+    if txs:
+        b["transactions"] = [_decode_tx(t) if isinstance(t, dict) else t for t in txs]
+    return b
+
+
+class BlockCache:
+    """
+    Size-bounded LRU of decoded transactions, plus the recent blocks they came
+    from as reorg checkpoints. Inserting a block whose hash or parentHash
+    disagrees with a cached one drops that block, everything above it and
+    their txs, so reorged data is never served. Cached dicts are shared:
+    callers must treat them as read-only.
+
+    A mined tx is only served from cache once it is `safe_depth` below the
+    highest head seen; shallower ones could still be reorged out without any
+    block fetch noticing, so they are re-fetched.
+    """
+
+    def __init__(self, max_blocks: int = 128, max_txs: int = 4096, safe_depth: int = 64):
+        self.max_blocks = max(1, int(max_blocks))
+        self.max_txs = max(1, int(max_txs))
+        self.safe_depth = max(0, int(safe_depth))
+        self.head = 0
+        self._blocks: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._txs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_tx(self, h: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            tx = self._txs.get(h.lower())
+            if tx is None or int(tx["blockNumber"]) > self.head - self.safe_depth:
+                return None
+            self._txs.move_to_end(h.lower())
+            return tx
+
+    def put_block(self, b: Dict[str, Any]) -> None:
+        n = b.get("number")
+        h = b.get("hash")
+        if not isinstance(n, int) or not isinstance(h, str):
+            return  # pending block
+        with self._lock:
+            old = self._blocks.get(n)
+            if old is not None and old.get("hash") != h:
+                self._invalidate_from(n)
+            parent = self._blocks.get(n - 1)
+            if parent is not None and parent.get("hash") != b.get("parentHash"):
+                self._invalidate_from(n - 1)
+
+            self._blocks[n] = b
+            self._blocks.move_to_end(n)
+            self.head = max(self.head, n)
+            while len(self._blocks) > self.max_blocks:
+                self._blocks.popitem(last=False)
+
+            for tx in b.get("transactions") or []:
+                if isinstance(tx, dict):
+                    self._put_tx(tx)
+
+    def note_head(self, n: int) -> None:
+        with self._lock:
+            if n > self.head:
+                self.head = n
+
+    def put_tx(self, tx: Dict[str, Any]) -> None:
+        with self._lock:
+            self._put_tx(tx)
+
+    def invalidate_from(self, n: int) -> None:
+        with self._lock:
+            self._invalidate_from(n)
+
+    def _put_tx(self, tx: Dict[str, Any]) -> None:
+        h = tx.get("hash")
+        if not isinstance(h, str) or tx.get("blockNumber") is None:
+            return  # pending txs can still move
+        h = h.lower()
+        self._txs[h] = tx
+        self._txs.move_to_end(h)
+        while len(self._txs) > self.max_txs:
+            self._txs.popitem(last=False)
+
+    def _invalidate_from(self, n: int) -> None:
+        for k in [k for k in self._blocks if k >= n]:
+            del self._blocks[k]
+        for k in [k for k, tx in self._txs.items() if int(tx["blockNumber"]) >= n]:
+            del self._txs[k]
+
+
+def _make_provider(endpoint: str, timeout: float) -> Any:
+    from web3 import Web3
+
+    try:
+        from web3.providers.ipc import IPCProvider  # type: ignore
+    except Exception:  # pragma: no cover
+        IPCProvider = None  # type: ignore
+
+    if endpoint.startswith(("http://", "https://")):
+        # HTTPProvider keeps a pooled requests session per endpoint
+        return Web3.HTTPProvider(endpoint, request_kwargs={"timeout": timeout})
+    if endpoint.startswith(("ws://", "wss://")):
+        return Web3.WebsocketProvider(endpoint, websocket_timeout=timeout)
+    if IPCProvider is not None:
+        return IPCProvider(endpoint, timeout=timeout)
+    # fallback for some versions
+    return Web3.IPCProvider(endpoint, timeout=timeout)  # type: ignore[attr-defined]
 
 
 class CypherRPC:
-    def __init__(self, ipc_path: str):
-        if IPCProvider is not None:
-            self.w3 = Web3(IPCProvider(ipc_path))
-        else:
-            # fallback for some versions
-            self.w3 = Web3(Web3.IPCProvider(ipc_path))  # type: ignore[attr-defined]
+    """
+    `endpoint` is an IPC socket path or an http(s):// / ws(s):// RPC URL.
+    Nodes on the same chain may share one BlockCache.
+    """
+
+    def __init__(self, endpoint: str, cache: Optional[BlockCache] = None, timeout: float = 10.0):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.cache = cache if cache is not None else BlockCache()
+        self._w3: Optional["Web3"] = None
+        self._w3_lock = threading.Lock()
+
+    @property
+    def w3(self) -> "Web3":
+        # built on first use so startup does not pay for web3 and the provider
+        if self._w3 is None:
+            with self._w3_lock:
+                if self._w3 is None:
+                    from web3 import Web3
+
+                    self._w3 = Web3(_make_provider(self.endpoint, self.timeout))
+        return self._w3
 
     def is_connected(self) -> bool:
         return bool(self.w3.is_connected())
 
     def block_number(self) -> int:
-        return int(self.w3.eth.block_number)
+        n = int(self.w3.eth.block_number)
+        self.cache.note_head(n)
+        return n
 
-    def get_block_full(self, n: int) -> Dict[str, Any]:
-        b = self.w3.eth.get_block(n, full_transactions=True)
-        return self._to_jsonable(b)
+    def fetch_block(self, n: int, full_transactions: bool = True) -> Dict[str, Any]:
+        """
+        Block as this node sees it, never from the (possibly shared) cache.
+        Without full_transactions `transactions` holds only the tx hashes.
+        """
+        raw = self._raw("eth_getBlockByNumber", [hex(n), full_transactions])
+        if raw is None:
+            from web3.exceptions import BlockNotFound
+
+            raise BlockNotFound(f"Block with id: {n} not found.")
+        return _decode_block(raw)
 
     def get_tx(self, txhash: str) -> Dict[str, Any]:
-        tx = self.w3.eth.get_transaction(txhash)
-        return self._to_jsonable(tx)
+        tx = self.cache.get_tx(txhash)
+        if tx is not None:
+            return tx
+        raw = self._raw("eth_getTransactionByHash", [txhash])
+        if raw is None:
+            from web3.exceptions import TransactionNotFound
+
+            raise TransactionNotFound(f"Transaction with hash: {txhash} not found.")
+        tx = _decode_tx(raw)
+        self.cache.put_tx(tx)
+        return tx
+
+    def invalidate_from(self, n: int) -> None:
+        self.cache.invalidate_from(n)
 
     def get_balance_cph(self, addr: str) -> float:
         wei = self.w3.eth.get_balance(addr)
@@ -65,6 +235,17 @@ class CypherRPC:
         except Exception:
             return None
 
+    def _raw(self, method: str, params: Any) -> Any:
+        """
+        Provider call without the web3 middleware/formatter stack: the node's
+        JSON result is returned as-is (hex strings, plain dicts and lists).
+        """
+        resp = self.w3.provider.make_request(method, params)
+        if "error" in resp:
+            err = resp["error"]
+            raise ValueError(err.get("message", err) if isinstance(err, dict) else err)
+        return resp.get("result")
+
     @staticmethod
     def _to_jsonable(obj: Any) -> Any:
 
@@ -1,6 +1,6 @@
 import json
 import urllib.request
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
 class OllamaLLM:
     def __init__(self, base_url: str, model: str, system_prompt: str):
@@ -29,3 +29,21 @@ class OllamaLLM:
         with urllib.request.urlopen(req, timeout=180) as resp:
             data = json.loads(resp.read().decode("utf-8"))
         return data.get("response", "").strip()
+
+
+class OllamaEmbedder:
+    def __init__(self, base_url: str, model: str):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        payload = {"model": self.model, "input": texts}
+        req = urllib.request.Request(
+            url=f"{self.base_url}/api/embed",
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(req, timeout=180) as resp:
+            data = json.loads(resp.read().decode("utf-8"))
+        return data.get("embeddings", [])
@@ -0,0 +1,187 @@
+import asyncio
+import copy
+import os
+from typing import Any, Dict, List, Optional
+
+from chain_stats import ChainStats, chain_stats_loop
+from cypher_rpc import BlockCache, CypherRPC
+from telegram_notify import PrefixedNotifier, TelegramNotifier
+from watchers import wallet_watch_loop, pm2_log_watch_loop
+from peer_geo import peer_geo_loop
+
+DEFAULT_PEER_GEO_PATH = "peer_geo.json"
+
+
+class Node:
+    def __init__(
+        self,
+        name: str,
+        chain: str,
+        cfg: Dict[str, Any],
+        rpc: CypherRPC,
+        state_path: str,
+        wallet_watch: bool,
+        pm2_watch: bool,
+        peer_geo: bool,
+        stats: Optional[ChainStats] = None,
+    ):
+        self.name = name
+        self.chain = chain
+        self.cfg = cfg
+        self.rpc = rpc
+        self.state_path = state_path
+        self.wallet_watch = wallet_watch
+        self.pm2_watch = pm2_watch
+        self.peer_geo = peer_geo
+        self.stats = stats
+
+    @property
+    def peer_geo_path(self) -> str:
+        return self.cfg.get("peer_geo", {}).get("output_path", DEFAULT_PEER_GEO_PATH)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "chain": self.chain,
+            "endpoint": self.rpc.endpoint,
+            "wallet_watch": self.wallet_watch,
+            "pm2_watch": self.pm2_watch,
+            "peer_geo": self.peer_geo,
+            "chain_stats": self.stats is not None,
+        }
+
+
+def _node_specs(cfg: Dict[str, Any]) -> List[Dict[str, Any]]:
+    specs = cfg.get("nodes")
+    if specs:
+        return list(specs)
+    # single-node config: cypher.ipc_path + pm2.app_name
+    return [{
+        "name": "default",
+        "ipc_path": cfg["cypher"]["ipc_path"],
+        "pm2_app_name": cfg.get("pm2", {}).get("app_name"),
+    }]
+
+
+def _per_node_path(path: str, name: str) -> str:
+    base, ext = os.path.splitext(path)
+    return f"{base}-{name}{ext}"
+
+
+def _node_cfg(cfg: Dict[str, Any], spec: Dict[str, Any], endpoint: str, first: bool) -> Dict[str, Any]:
+    """Per-node copy of the global config with node overrides applied, so the
+    existing loops can keep reading cfg["cypher"], cfg["pm2"], cfg["peer_geo"]."""
+    node_cfg = copy.deepcopy(cfg)
+    node_cfg["cypher"]["ipc_path"] = endpoint
+    if spec.get("poll_interval_sec") is not None:
+        node_cfg["cypher"]["poll_interval_sec"] = spec["poll_interval_sec"]
+    if spec.get("pm2_app_name"):
+        node_cfg.setdefault("pm2", {})["app_name"] = spec["pm2_app_name"]
+    pg = node_cfg.setdefault("peer_geo", {})
+    if not first:
+        pg["output_path"] = _per_node_path(pg.get("output_path", DEFAULT_PEER_GEO_PATH), spec["name"])
+    return node_cfg
+
+
+class NodeManager:
+    """
+    Builds one CypherRPC per configured node (nodes on the same `chain` share
+    a BlockCache) and schedules each node's background loops.
+    """
+
+    def __init__(self, cfg: Dict[str, Any], notifier: TelegramNotifier, state_path: str):
+        self.cfg = cfg
+        self.notifier = notifier
+        self.nodes: Dict[str, Node] = {}
+        self.caches: Dict[str, BlockCache] = {}
+        self.tasks: List["asyncio.Task[Any]"] = []
+
+        cy = cfg["cypher"]
+        cs = cfg.get("chain_stats", {})
+        wallet_chains = set()
+        for i, spec in enumerate(_node_specs(cfg)):
+            name = str(spec.get("name") or f"node{i}")
+            if name in self.nodes:
+                raise ValueError(f"duplicate node name: {name}")
+            spec = {**spec, "name": name}
+            endpoint = spec.get("rpc_url") or spec.get("ipc_path")
+            if not endpoint:
+                raise ValueError(f"node {name}: ipc_path or rpc_url is required")
+
+            chain = str(spec.get("chain", "default"))
+            cache = self.caches.get(chain)
+            if cache is None:
+                cache = self.caches[chain] = BlockCache(
+                    max_blocks=int(cy.get("block_cache_size", 128)),
+                    max_txs=int(cy.get("tx_cache_size", 4096)),
+                    safe_depth=int(cfg.get("wallet_watch", {}).get("reorg_window", 64)),
+                )
+
+            # by default only the first node of each chain alerts on wallet txs,
+            # otherwise every node on that chain would send the same alert
+            wallet_watch = bool(spec.get("wallet_watch", chain not in wallet_chains))
+            if wallet_watch:
+                wallet_chains.add(chain)
+
+            first = i == 0
+            self.nodes[name] = Node(
+                name=name,
+                chain=chain,
+                cfg=_node_cfg(cfg, spec, endpoint, first),
+                rpc=CypherRPC(endpoint, cache=cache, timeout=float(spec.get("timeout_sec", 10))),
+                state_path=state_path if first else _per_node_path(state_path, name),
+                wallet_watch=wallet_watch,
+                pm2_watch=bool(spec.get("pm2_app_name")),
+                peer_geo=bool(spec.get("peer_geo", True)),
+                stats=ChainStats(
+                    history_blocks=int(cs.get("history_blocks", 1024)),
+                    rate_window_sec=float(cs.get("rate_window_sec", 60)),
+                    stall_after_sec=float(cs.get("stall_after_sec", 120)),
+                ) if spec.get("chain_stats", cs.get("enabled", True)) else None,
+            )
+
+    @property
+    def default(self) -> Node:
+        return next(iter(self.nodes.values()))
+
+    def get(self, name: Optional[str] = None) -> Optional[Node]:
+        if not name:
+            return self.default
+        return self.nodes.get(name)
+
+    def _notifier_for(self, node: Node) -> Any:
+        if len(self.nodes) == 1:
+            return self.notifier
+        return PrefixedNotifier(self.notifier, node.name)
+
+    async def start(self, watchlist_path: str, stagger_sec: float = 0.0) -> None:
+        """Starts the loops one by one, `stagger_sec` apart, so their first
+        IPC round-trips and file reads do not all land at once."""
+        for node in self.nodes.values():
+            notifier = self._notifier_for(node)
+            loops = []
+            # the head pipeline also feeds chain stats; non-alerting nodes run
+            # it silently and header-only
+            if node.wallet_watch or node.stats is not None:
+                loops.append(wallet_watch_loop(
+                    node.cfg, node.rpc, notifier, watchlist_path, node.state_path,
+                    stats=node.stats, alerts=node.wallet_watch,
+                ))
+            if node.stats is not None:
+                loops.append(chain_stats_loop(
+                    node.cfg, node.rpc, node.stats, notifier, alerts=node.wallet_watch,
+                ))
+            if node.pm2_watch:
+                loops.append(pm2_log_watch_loop(node.cfg, notifier))
+            if node.peer_geo:
+                loops.append(peer_geo_loop(node.cfg, node.rpc))
+            for coro in loops:
+                self.tasks.append(asyncio.create_task(coro))
+                if stagger_sec > 0:
+                    await asyncio.sleep(stagger_sec)
+
+    async def stop(self) -> None:
+        for t in self.tasks:
+            t.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks.clear()
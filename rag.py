@@ -0,0 +1,324 @@
+import hashlib
+import os
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from storage import load_json, save_json
+
+DEFAULT_EXTS = (".go", ".md", ".json", ".yaml", ".yml", ".toml", ".ini", ".conf")
+DEFAULT_SKIP_DIRS = ("vendor", "node_modules", ".git", "build")
+INDEX_FORMAT = 2  # meta.json layout; older indexes are rebuilt
+
+
+def _chunk_text(text: str, chunk_chars: int, overlap_lines: int) -> List[Tuple[int, int, int, int]]:
+    """
+    Splits on line boundaries into pieces of at most chunk_chars:
+    (start_line, end_line, start_char, end_char), lines 1-based, chars into `text`.
+    Lines longer than chunk_chars (minified JSON etc.) are hard-split.
+    """
+    segs: List[Tuple[int, int, int]] = []  # (line, start_char, end_char)
+    pos = 0
+    for ln, line in enumerate(text.splitlines(keepends=True), 1):
+        for off in range(0, len(line), chunk_chars):
+            segs.append((ln, pos + off, pos + min(len(line), off + chunk_chars)))
+        pos += len(line)
+
+    out: List[Tuple[int, int, int, int]] = []
+    start = 0
+    while start < len(segs):
+        end = start + 1
+        while end < len(segs) and segs[end][2] - segs[start][1] <= chunk_chars:
+            end += 1
+        a, b = segs[start][1], segs[end - 1][2]
+        if text[a:b].strip():
+            out.append((segs[start][0], segs[end - 1][0], a, b))
+        if end >= len(segs):
+            break
+        start = max(start + 1, end - overlap_lines)
+    return out
+
+
+def _sha(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class RepoIndex:
+    """
+    Chunked embedding index over a source tree.
+
+    On disk (`index_dir`): `vectors.npy` holds unit-normalised float32 rows,
+    opened with mmap_mode="r"; `meta.json` holds per-file mtime/size and per-row
+    path, line/char range and content hash (no text: search re-reads the few
+    hits from disk). `refresh()` only re-reads files whose mtime/size changed
+    and only embeds chunks whose hash is new. Each embedded batch is appended
+    to a side store (`pending.f32` / `pending.sha`) first, so a refresh that
+    fails part-way resumes from there instead of re-embedding. Other
+    processes pick up a refreshed index on their next `search()`.
+    """
+
+    def __init__(
+        self,
+        base: str,
+        index_dir: str,
+        embed: Callable[[List[str]], List[List[float]]],
+        is_denied: Callable[[str], bool],
+        model: str = "",
+        exts: Iterable[str] = DEFAULT_EXTS,
+        skip_dirs: Iterable[str] = DEFAULT_SKIP_DIRS,
+        chunk_chars: int = 1200,
+        overlap_lines: int = 3,
+        max_file_bytes: int = 512 * 1024,
+        batch_size: int = 32,
+    ):
+        self.base = base
+        self.index_dir = index_dir
+        self.embed = embed
+        self.is_denied = is_denied
+        self.model = model
+        self.exts = {e.lower() for e in exts}
+        self.skip_dirs = set(skip_dirs)
+        self.chunk_chars = chunk_chars
+        self.overlap_lines = overlap_lines
+        self.max_file_bytes = max_file_bytes
+        self.batch_size = batch_size
+
+        self._lock = threading.Lock()
+        self._loaded_mtime: Optional[float] = None
+        self._vecs: Optional[np.ndarray] = None
+        self._chunks: List[Dict[str, Any]] = []
+
+    @property
+    def _vec_path(self) -> str:
+        return os.path.join(self.index_dir, "vectors.npy")
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.index_dir, "meta.json")
+
+    @property
+    def _pending_vec_path(self) -> str:
+        return os.path.join(self.index_dir, "pending.f32")
+
+    @property
+    def _pending_sha_path(self) -> str:
+        return os.path.join(self.index_dir, "pending.sha")
+
+    def _load_pending(self) -> Tuple[Dict[str, int], Optional[np.ndarray]]:
+        """sha -> row of vectors embedded by an earlier, unfinished refresh."""
+        try:
+            with open(self._pending_sha_path, "r", encoding="utf-8") as f:
+                header = f.readline().split()
+                shas = [line.strip() for line in f if line.strip()]
+            if len(header) != 2 or header[0] != self.model:
+                raise ValueError("pending store from another model")
+            dim = int(header[1])
+            rows = min(len(shas), os.path.getsize(self._pending_vec_path) // (4 * dim))
+            if rows == 0:
+                return {}, None
+            vecs = np.memmap(self._pending_vec_path, dtype=np.float32, mode="r", shape=(rows, dim))
+        except (OSError, ValueError):
+            self._drop_pending()
+            return {}, None
+        return {sha: i for i, sha in enumerate(shas[:rows])}, vecs
+
+    def _drop_pending(self) -> None:
+        for path in (self._pending_vec_path, self._pending_sha_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _iter_files(self) -> Iterable[Tuple[str, os.stat_result]]:
+        for root, dirs, files in os.walk(self.base):
+            dirs[:] = [d for d in dirs if d not in self.skip_dirs and not self.is_denied(os.path.join(root, d))]
+            for fn in files:
+                if os.path.splitext(fn)[1].lower() not in self.exts:
+                    continue
+                path = os.path.join(root, fn)
+                if self.is_denied(path):
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if st.st_size == 0 or st.st_size > self.max_file_bytes:
+                    continue
+                yield path, st
+
+    def _read_text(self, path: str) -> Optional[str]:
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+        except OSError:
+            return None
+        if b"\x00" in raw[:4096]:
+            return None
+        return raw.decode("utf-8", errors="ignore")
+
+    def _read_chunks(self, path: str) -> List[Tuple[int, int, int, int, str]]:
+        text = self._read_text(path)
+        if text is None:
+            return []
+        return [
+            (sl, el, a, b, text[a:b].strip())
+            for sl, el, a, b in _chunk_text(text, self.chunk_chars, self.overlap_lines)
+        ]
+
+    def refresh(self) -> Dict[str, Any]:
+        old_meta = load_json(self._meta_path, {"files": {}, "chunks": []})
+        if old_meta.get("model") != self.model or old_meta.get("format") != INDEX_FORMAT:
+            old_meta = {"files": {}, "chunks": []}  # another model or layout: rebuild
+        old_files: Dict[str, Any] = old_meta.get("files", {})
+        old_vecs = np.load(self._vec_path, mmap_mode="r") if old_meta["chunks"] and os.path.exists(self._vec_path) else None
+
+        old_by_file: Dict[str, List[int]] = {}
+        old_by_sha: Dict[str, int] = {}
+        for i, c in enumerate(old_meta["chunks"]):
+            old_by_file.setdefault(c["path"], []).append(i)
+            old_by_sha.setdefault(c["sha"], i)
+
+        files: Dict[str, Any] = {}
+        chunks: List[Dict[str, Any]] = []
+        sources: List[Optional[int]] = []  # old row to copy, or None to embed
+        texts: Dict[int, str] = {}  # chunk index -> text, for rows to embed
+        reread = 0
+        for path, st in self._iter_files():
+            short = path.replace(self.base, ".", 1)
+            sig = {"mtime": st.st_mtime, "size": st.st_size}
+            files[short] = sig
+            if old_vecs is not None and old_files.get(short) == sig:
+                for i in old_by_file.get(short, []):
+                    chunks.append(old_meta["chunks"][i])
+                    sources.append(i)
+                continue
+            reread += 1
+            for start, end, a, b, text in self._read_chunks(path):
+                sha = _sha(text)
+                src = old_by_sha.get(sha) if old_vecs is not None else None
+                if src is None:
+                    texts[len(chunks)] = text
+                chunks.append({"path": short, "start": start, "end": end, "a": a, "b": b, "sha": sha})
+                sources.append(src)
+
+        missing = [i for i, src in enumerate(sources) if src is None]
+        if old_vecs is not None and not missing and len(chunks) == len(old_meta["chunks"]) and files == old_files:
+            self._drop_pending()
+            return {"chunks": len(chunks), "files": len(files), "reread": reread, "embedded": 0}
+
+        os.makedirs(self.index_dir, exist_ok=True)
+        pending, pending_vecs = self._load_pending()
+        new_rows: Dict[int, np.ndarray] = {}
+        todo: List[int] = []
+        for i in missing:
+            row = pending.get(chunks[i]["sha"])
+            if row is not None and pending_vecs is not None:
+                new_rows[i] = pending_vecs[row]
+            else:
+                todo.append(i)
+
+        for b in range(0, len(todo), self.batch_size):
+            idx = todo[b:b + self.batch_size]
+            emb = np.asarray(self.embed([texts[i] for i in idx]), dtype=np.float32)
+            emb /= np.maximum(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12)
+            # vectors before shas: a crash in between only loses this batch
+            if not os.path.exists(self._pending_sha_path):
+                with open(self._pending_sha_path, "w", encoding="utf-8") as f:
+                    f.write(f"{self.model} {emb.shape[1]}\n")
+            with open(self._pending_vec_path, "ab") as f:
+                f.write(emb.tobytes())
+            with open(self._pending_sha_path, "a", encoding="utf-8") as f:
+                f.write("".join(chunks[i]["sha"] + "\n" for i in idx))
+            for i, row in zip(idx, emb):
+                new_rows[i] = row
+
+        if old_vecs is not None and old_vecs.shape[0]:
+            dim = old_vecs.shape[1]
+        elif new_rows:
+            dim = next(iter(new_rows.values())).shape[0]
+        else:
+            dim = 0
+
+        tmp = self._vec_path + f".{os.getpid()}.tmp.npy"
+        out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(len(chunks), dim))
+        for i, src in enumerate(sources):
+            out[i] = old_vecs[src] if src is not None else new_rows[i]
+        out.flush()
+        del out
+        os.replace(tmp, self._vec_path)
+        save_json(
+            self._meta_path,
+            {"format": INDEX_FORMAT, "model": self.model, "dim": dim, "files": files, "chunks": chunks},
+            indent=None,
+        )
+        del pending_vecs
+        self._drop_pending()
+        return {"chunks": len(chunks), "files": len(files), "reread": reread, "embedded": len(todo)}
+
+    def _load(self) -> bool:
+        try:
+            mtime = os.stat(self._meta_path).st_mtime
+        except OSError:
+            return False
+        with self._lock:
+            if mtime != self._loaded_mtime:
+                try:
+                    meta = load_json(self._meta_path, {"chunks": []})
+                    vecs = np.load(self._vec_path, mmap_mode="r")
+                except (OSError, ValueError):
+                    return self._vecs is not None
+                if meta.get("format") != INDEX_FORMAT or vecs.shape[0] != len(meta["chunks"]):
+                    return self._vecs is not None  # caught between the two writes
+                self._vecs, self._chunks, self._loaded_mtime = vecs, meta["chunks"], mtime
+            return self._vecs is not None and self._vecs.shape[0] > 0
+
+    def ready(self) -> bool:
+        return self._load()
+
+    def search(self, query: str, k: int = 4, batch_rows: int = 8192) -> List[Dict[str, Any]]:
+        if not self._load():
+            return []
+        vecs, chunks = self._vecs, self._chunks
+        assert vecs is not None
+
+        q = np.asarray(self.embed([query])[0], dtype=np.float32)
+        q /= max(float(np.linalg.norm(q)), 1e-12)
+
+        # batched matvec keeps only `batch_rows` of the mmap resident at a time
+        scores = np.empty(vecs.shape[0], dtype=np.float32)
+        for i in range(0, vecs.shape[0], batch_rows):
+            scores[i:i + batch_rows] = vecs[i:i + batch_rows] @ q
+
+        # over-fetch candidates: hits whose file is now denied or has changed
+        # since the last refresh are skipped in favour of the next best
+        if k <= 0:
+            return []
+        pool = min(k * 4, scores.shape[0])
+        top = np.argpartition(-scores, pool - 1)[:pool]
+        top = top[np.argsort(-scores[top])]
+
+        files: Dict[str, Optional[str]] = {}
+        out: List[Dict[str, Any]] = []
+        for i in top:
+            if len(out) >= k:
+                break
+            c = chunks[i]
+            path = os.path.join(self.base, c["path"][2:])
+            if self.is_denied(path):
+                continue
+            if c["path"] not in files:
+                files[c["path"]] = self._read_text(path)
+            text = files[c["path"]]
+            if text is None:
+                continue  # removed since the last refresh
+            body = text[c["a"]:c["b"]].strip()
+            if _sha(body) != c["sha"]:
+                continue  # edited since the last refresh: offsets no longer line up
+            out.append({
+                "path": c["path"],
+                "lines": f"{c['start']}-{c['end']}",
+                "score": round(float(scores[i]), 4),
+                "text": body,
+            })
+        return out
@@ -1,21 +1,34 @@
+import fcntl
 import json
 import os
-from typing import Any, Dict, List
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
 
 def _atomic_write(path: str, data: str) -> None:
-    tmp = path + ".tmp"
+    # per-process tmp name: several workers may write the same file
+    tmp = f"{path}.{os.getpid()}.tmp"
     with open(tmp, "w", encoding="utf-8") as f:
         f.write(data)
     os.replace(tmp, path)
 
+@contextmanager
+def locked(path: str) -> Iterator[None]:
+    """Cross-process lock for read-modify-write of `path` (uses `path`.lock)."""
+    with open(path + ".lock", "a") as lf:
+        fcntl.flock(lf, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lf, fcntl.LOCK_UN)
+
 def load_json(path: str, default: Any) -> Any:
     if not os.path.exists(path):
         return default
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
-def save_json(path: str, obj: Any) -> None:
-    _atomic_write(path, json.dumps(obj, ensure_ascii=False, indent=2))
+def save_json(path: str, obj: Any, indent: Optional[int] = 2) -> None:
+    _atomic_write(path, json.dumps(obj, ensure_ascii=False, indent=indent))
 
 def normalize_addr(a: str) -> str:
     a = a.strip()
@@ -24,16 +37,18 @@ def normalize_addr(a: str) -> str:
     return a.lower()
 
 def add_watch_address(watchlist_path: str, addr: str) -> List[str]:
-    wl = load_json(watchlist_path, {"addresses": []})
-    addr = normalize_addr(addr)
-    if addr not in wl["addresses"]:
-        wl["addresses"].append(addr)
-        save_json(watchlist_path, wl)
-    return wl["addresses"]
+    with locked(watchlist_path):
+        wl = load_json(watchlist_path, {"addresses": []})
+        addr = normalize_addr(addr)
+        if addr not in wl["addresses"]:
+            wl["addresses"].append(addr)
+            save_json(watchlist_path, wl)
+        return wl["addresses"]
 
 def remove_watch_address(watchlist_path: str, addr: str) -> List[str]:
-    wl = load_json(watchlist_path, {"addresses": []})
-    addr = normalize_addr(addr)
-    wl["addresses"] = [a for a in wl["addresses"] if a != addr]
-    save_json(watchlist_path, wl)
-    return wl["addresses"]
+    with locked(watchlist_path):
+        wl = load_json(watchlist_path, {"addresses": []})
+        addr = normalize_addr(addr)
+        wl["addresses"] = [a for a in wl["addresses"] if a != addr]
+        save_json(watchlist_path, wl)
+        return wl["addresses"]
@@ -1,13 +1,36 @@
-from typing import Optional
-from telegram import Bot
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from telegram import Bot
 
 class TelegramNotifier:
     def __init__(self, bot_token: str, chat_id: str, enabled: bool = True):
         self.enabled = enabled
         self.chat_id = chat_id
-        self.bot: Optional[Bot] = Bot(token=bot_token) if enabled else None
+        self._bot_token = bot_token
+        self._bot: Optional["Bot"] = None
+
+    @property
+    def bot(self) -> Optional["Bot"]:
+        # python-telegram-bot is imported on the first alert, not at startup
+        if self._bot is None and self.enabled:
+            from telegram import Bot
+
+            self._bot = Bot(token=self._bot_token)
+        return self._bot
 
     async def send(self, text: str) -> None:
         if not self.enabled or not self.bot:
             return
         await self.bot.send_message(chat_id=self.chat_id, text=text)
+
+
+class PrefixedNotifier:
+    """Tags every message with a node label; shares the wrapped notifier's bot."""
+
+    def __init__(self, notifier: TelegramNotifier, prefix: str):
+        self.notifier = notifier
+        self.prefix = prefix
+
+    async def send(self, text: str) -> None:
+        await self.notifier.send(f"[{self.prefix}] {text}")
@@ -1,41 +1,154 @@
 import asyncio
 import os
-from typing import Dict, Any, List, Optional, Set
-import yaml
+from collections import deque
+from typing import Dict, Any, Deque, List, Optional, Set, Tuple
 
 from storage import load_json, save_json, normalize_addr
 from cypher_rpc import CypherRPC
+from chain_stats import ChainStats
 from telegram_notify import TelegramNotifier
 
 def wei_to_cph(wei: int) -> float:
     return wei / 10**18
 
+def _tx_alerts(
+    b: Dict[str, Any],
+    watch: Set[str],
+    min_cph: float,
+    notify_in: bool,
+    notify_out: bool,
+) -> List[Dict[str, Any]]:
+    hits: List[Dict[str, Any]] = []
+    txs: List[Dict[str, Any]] = b.get("transactions", [])
+    for tx in txs:
+        frm = (tx.get("from") or "").lower()
+        to = (tx.get("to") or "").lower() if tx.get("to") else ""
+        val_wei = int(tx.get("value", 0))
+        val_cph = wei_to_cph(val_wei)
+
+        hit_in = notify_in and (to in watch) and (val_cph >= min_cph)
+        hit_out = notify_out and (frm in watch) and (val_cph >= min_cph)
+        if not (hit_in or hit_out):
+            continue
+
+        txh = tx.get("hash")
+        if hasattr(txh, "hex"):
+            txh = txh.hex()
+        hits.append({
+            "direction": "IN" if hit_in else "OUT",
+            "from": frm,
+            "to": to,
+            "value_cph": val_cph,
+            "tx": txh,
+        })
+    return hits
+
+
+def _alert_msg(hit: Dict[str, Any], n: int, min_cph: float, tag: str) -> str:
+    return (
+        f"💸 Wallet Tx Alert ({hit['direction']}){tag}\n"
+        f"Block: {n}\n"
+        f"From: {hit['from']}\n"
+        f"To: {hit['to']}\n"
+        f"Value: {hit['value_cph']:.6f} CPH (>= {min_cph})\n"
+        f"Tx: {hit['tx']}"
+    )
+
+
 async def wallet_watch_loop(
     cfg: Dict[str, Any],
     rpc: CypherRPC,
     notifier: TelegramNotifier,
     watchlist_path: str,
     state_path: str,
+    stats: Optional[ChainStats] = None,
+    alerts: bool = True,
 ):
+    """
+    Follows the head one block at a time, keeping a ring of recent
+    (number, hash) checkpoints. A block whose parentHash does not match the
+    previous checkpoint means a reorg: checkpoints are popped and those heights
+    re-fetched until the chain links up again, so only the replaced range is
+    re-processed. Alerts are "final" once a block is `confirmations` deep and
+    its hash still matches the chain at that height; with `notify_unconfirmed`
+    an early alert is also sent on first sight (and retracted if reorged out).
+
+    With `stats`, every fetched block also feeds the chain statistics, so the
+    loop walks blocks even when nothing is watched (or `alerts` is off); then
+    only headers are fetched. Blocks are always read from this node, not the
+    shared cache, so the reorg check and the stats reflect this node's chain.
+    With `alerts` off nothing is sent to `notifier`: the chain's alerting node
+    already reports reorgs and errors.
+    """
     poll = float(cfg["cypher"]["poll_interval_sec"])
-    min_cph = float(cfg["wallet_watch"]["min_cph"])
-    notify_in = bool(cfg["wallet_watch"]["notify_incoming"])
-    notify_out = bool(cfg["wallet_watch"]["notify_outgoing"])
+    ww = cfg["wallet_watch"]
+    min_cph = float(ww["min_cph"])
+    notify_in = bool(ww["notify_incoming"])
+    notify_out = bool(ww["notify_outgoing"])
+    confirmations = max(0, int(ww.get("confirmations", 0)))
+    notify_unconfirmed = bool(ww.get("notify_unconfirmed", False)) and confirmations > 0
+    window = max(confirmations + 1, int(ww.get("reorg_window", 64)))
+    max_catchup = int(cfg.get("chain_stats", {}).get("max_catchup_blocks", 256))
 
     state = load_json(state_path, {"last_block": None})
     last_block: Optional[int] = state.get("last_block")
+    ring: Deque[Tuple[int, str]] = deque(
+        ((int(n), str(h)) for n, h in state.get("checkpoints", [])), maxlen=window
+    )
+    # block number -> {"hash": ..., "hits": [...]} awaiting confirmation depth
+    pending: Dict[int, Dict[str, Any]] = {
+        int(p["number"]): {"hash": p["hash"], "hits": p["hits"]}
+        for p in state.get("pending", [])
+    }
+
+    def save_state() -> None:
+        save_json(state_path, {
+            "last_block": last_block,
+            "checkpoints": [[n, h] for n, h in ring],
+            "pending": [
+                {"number": n, "hash": p["hash"], "hits": p["hits"]}
+                for n, p in sorted(pending.items())
+            ],
+        })
+
+    async def retract(n: int, hits: List[Dict[str, Any]]) -> None:
+        if notify_unconfirmed:
+            for hit in hits:
+                await notifier.send(f"↩️ Reorg dropped unconfirmed alert (block {n}): {hit['tx']}")
+
+    async def settle(head: int) -> None:
+        # pending hits that are deep enough: final if their block is still the
+        # one on chain (checked against the ring, or a header when it was
+        # cleared), retracted otherwise
+        checkpoints = dict(ring)
+        for k in sorted(k for k in pending if head - k >= confirmations):
+            h = checkpoints.get(k)
+            if h is None:
+                h = rpc.fetch_block(k, full_transactions=False).get("hash")
+            p = pending.pop(k)
+            if str(h) != str(p["hash"]):
+                await retract(k, p["hits"])
+            else:
+                for hit in p["hits"]:
+                    await notifier.send(
+                        _alert_msg(hit, k, min_cph, f" [final, {confirmations} conf]")
+                    )
+            save_state()
 
     while True:
         try:
             if not rpc.is_connected():
-                await notifier.send("⚠️ Cypher IPC not connected. Retrying...")
+                if alerts:
+                    await notifier.send("⚠️ Cypher IPC not connected. Retrying...")
                 await asyncio.sleep(3)
                 continue
 
             bn = rpc.block_number()
+            if stats is not None:
+                stats.record_head(bn)
             if last_block is None:
                 last_block = bn
-                save_json(state_path, {"last_block": last_block})
+                save_state()
                 await asyncio.sleep(poll)
                 continue
 
@@ -44,49 +157,74 @@ async def wallet_watch_loop(
                 continue
 
             wl = load_json(watchlist_path, {"addresses": []})
-            watch: Set[str] = set(normalize_addr(a) for a in wl.get("addresses", []))
-            if not watch:
+            watch: Set[str] = set(normalize_addr(a) for a in wl.get("addresses", [])) if alerts else set()
+            if not watch and stats is None:
+                # nothing left to walk; hits already seen still get settled
                 last_block = bn
-                save_json(state_path, {"last_block": last_block})
+                ring.clear()
+                save_state()
+                await settle(bn)
                 await asyncio.sleep(poll)
                 continue
 
-            for n in range(last_block + 1, bn + 1):
-                b = rpc.get_block_full(n)
-                txs: List[Dict[str, Any]] = b.get("transactions", [])
-                for tx in txs:
-                    frm = (tx.get("from") or "").lower()
-                    to = (tx.get("to") or "").lower() if tx.get("to") else ""
-                    val_wei = int(tx.get("value", 0))
-                    val_cph = wei_to_cph(val_wei)
-
-                    hit_in = notify_in and (to in watch) and (val_cph >= min_cph)
-                    hit_out = notify_out and (frm in watch) and (val_cph >= min_cph)
-                    if not (hit_in or hit_out):
-                        continue
-
-                    direction = "IN" if hit_in else "OUT"
-                    txh = tx.get("hash")
-                    if hasattr(txh, "hex"):
-                        txh = txh.hex()
-
-                    msg = (
-                        f"💸 Wallet Tx Alert ({direction})\n"
-                        f"Block: {n}\n"
-                        f"From: {frm}\n"
-                        f"To: {to}\n"
-                        f"Value: {val_cph:.6f} CPH (>= {min_cph})\n"
-                        f"Tx: {txh}"
+            if not watch and bn - last_block > max_catchup:
+                # stats only: skip far-behind history instead of walking it
+                last_block = bn - max_catchup
+                ring.clear()
+
+            n = last_block + 1
+            reorg_depth = 0
+            while n <= bn:
+                b = rpc.fetch_block(n, full_transactions=bool(watch))
+                if ring and ring[-1][0] == n - 1 and b.get("parentHash") != ring[-1][1]:
+                    # parent was replaced: step back one height and re-fetch it
+                    dropped, _ = ring.pop()
+                    rpc.invalidate_from(dropped)
+                    if stats is not None:
+                        stats.rewind(dropped)
+                    lost = pending.pop(dropped, None)
+                    if lost:
+                        await retract(dropped, lost["hits"])
+                    reorg_depth += 1
+                    last_block = dropped - 1
+                    n = dropped
+                    continue
+
+                if reorg_depth and alerts:
+                    await notifier.send(
+                        f"🔀 Reorg detected: {reorg_depth} block(s) replaced from #{n}"
+                        if ring else
+                        f"🔀 Reorg deeper than {window} blocks; resuming at #{n}"
                     )
-                    await notifier.send(msg)
+                reorg_depth = 0
+
+                if watch:
+                    rpc.cache.put_block(b)
+                if stats is not None:
+                    stats.record_block(b)
+                hits = _tx_alerts(b, watch, min_cph, notify_in, notify_out) if watch else []
+                if confirmations == 0:
+                    for hit in hits:
+                        await notifier.send(_alert_msg(hit, n, min_cph, ""))
+                elif hits:
+                    pending[n] = {"hash": b.get("hash"), "hits": hits}
+                    if notify_unconfirmed:
+                        for hit in hits:
+                            await notifier.send(
+                                _alert_msg(hit, n, min_cph, f" [unconfirmed 0/{confirmations}]")
+                            )
 
+                ring.append((n, str(b.get("hash"))))
                 last_block = n
-                save_json(state_path, {"last_block": last_block})
+                save_state()
+                n += 1
 
+            await settle(bn)
             await asyncio.sleep(poll)
 
         except Exception as e:
-            await notifier.send(f"⚠️ wallet_watch_loop error: {e}")
+            if alerts:
+                await notifier.send(f"⚠️ wallet_watch_loop error: {e}")
             await asyncio.sleep(3)
 
 async def pm2_log_watch_loop(cfg: Dict[str, Any], notifier: TelegramNotifier):